@@ -0,0 +1,46 @@
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
+from dotenv import load_dotenv
+
+
+@dataclass(frozen=True)
+class Config:
+    quartr_api_key: Optional[str]
+    aws_access_key_id: Optional[str]
+    aws_secret_access_key: Optional[str]
+    aws_default_region: Optional[str]
+    default_s3_bucket: Optional[str]
+    redis_url: Optional[str]
+    stream_url: Optional[str]
+    app_url: Optional[str]
+
+    @property
+    def is_complete(self) -> bool:
+        """Whether every variable the app cannot run without is set"""
+        return all([
+            self.quartr_api_key,
+            self.aws_access_key_id,
+            self.aws_secret_access_key,
+            self.aws_default_region,
+            self.redis_url,
+            self.stream_url,
+        ])
+
+
+@lru_cache(maxsize=1)
+def get_config() -> Config:
+    """Environment configuration, read once per process rather than per rerun"""
+    load_dotenv()
+    return Config(
+        quartr_api_key=os.getenv("QUARTR_API_KEY"),
+        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+        aws_default_region=os.getenv("AWS_DEFAULT_REGION"),
+        default_s3_bucket=os.getenv("DEFAULT_S3_BUCKET"),
+        redis_url=os.getenv("REDIS_URL"),
+        stream_url=os.getenv("STREAM_URL"),
+        app_url=os.getenv("APP_URL"),
+    )
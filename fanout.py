@@ -0,0 +1,49 @@
+"""Per-ISIN subtasks for the worker
+
+Start the consumer on this module (``huey_consumer fanout.huey``) rather
+than on ``tasks`` so these tasks and their progress signals are
+registered next to the worker's own tasks. A consumer that has them
+loaded keeps a heartbeat key alive, which the page checks before
+queueing anything.
+"""
+from huey import crontab
+
+from progress import register_group_signals
+from tasks import huey, process_files_task
+
+HEARTBEAT_KEY = "quartr:fanout:heartbeat"
+HEARTBEAT_TTL = 150  # seconds; outlives two missed minutely beats
+
+
+@huey.task(context=True)
+def process_isin(isin, start_date, end_date, doc_types, s3_bucket, group_id, task=None):
+    # group_id is only read by the progress signal handlers, from the task args
+    kwargs = {"task": task} if process_files_task.context else {}
+    return process_files_task.call_local(
+        [isin], start_date, end_date, doc_types, s3_bucket, **kwargs
+    )
+
+
+register_group_signals(huey, process_isin)
+
+
+def _beat():
+    huey.storage.conn.set(HEARTBEAT_KEY, 1, ex=HEARTBEAT_TTL)
+
+
+@huey.on_startup()
+def announce_consumer():
+    _beat()
+
+
+@huey.periodic_task(crontab(minute="*"))
+def consumer_heartbeat():
+    _beat()
+
+
+def consumer_running() -> bool:
+    """Whether a consumer started on this module has been seen recently"""
+    if huey.immediate:
+        # Tasks run in the calling process, there is no consumer to wait for
+        return True
+    return bool(huey.storage.conn.exists(HEARTBEAT_KEY))
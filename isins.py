@@ -0,0 +1,31 @@
+import re
+from typing import List, Tuple
+
+import numpy as np
+
+# Country code, nine-character national identifier, check digit
+_ISIN_RE = re.compile(r"[A-Z]{2}[A-Z0-9]{9}[0-9]")
+
+
+def parse_isins(text: str) -> Tuple[List[str], List[str]]:
+    """Split the textarea into well-formed ISINs and malformed entries, both deduplicated"""
+    entries = set(text.upper().split())
+    isins = set(filter(_ISIN_RE.fullmatch, entries))
+    return sorted(isins), sorted(entries - isins)
+
+
+def valid_isins(isins: List[str]) -> List[str]:
+    """Keep the ISINs whose check digit passes the mod-10 (Luhn) test"""
+    if not isins:
+        return []
+    chars = np.frombuffer("".join(isins).encode(), dtype=np.uint8).reshape(-1, 12)
+    # Letters count as 10-35 and expand to two digits, digits stay single
+    values = np.where(chars >= 65, chars - 55, chars - 48).astype(np.int64)
+    digits = np.stack([values // 10, values % 10], axis=2).reshape(-1, 24)
+    present = np.stack([values >= 10, np.ones_like(values, dtype=bool)], axis=2).reshape(-1, 24)
+    # Position of each digit counted from the right of the expanded string
+    position = np.cumsum(present[:, ::-1], axis=1)[:, ::-1] - 1
+    doubled = np.where(position % 2 == 1, digits * 2, digits)
+    doubled = np.where(doubled > 9, doubled - 9, doubled)
+    checksum = np.sum(np.where(present, doubled, 0), axis=1)
+    return [isin for isin, ok in zip(isins, checksum % 10 == 0) if ok]
@@ -0,0 +1,161 @@
+import threading
+
+import orjson
+from huey.signals import SIGNAL_COMPLETE, SIGNAL_ERROR
+
+TERMINAL_STATUSES = ("Complete", "Failed")
+PROGRESS_TTL = 3600  # seconds a task's progress hash outlives its last update
+PUBLISH_INTERVAL_MS = 250  # least time between two intermediate progress events
+_COUNTERS = ("total", "processed", "success", "failed")
+
+
+def progress_channel(task_id: str) -> str:
+    """Redis pub/sub channel carrying progress events for a task"""
+    return f"task:{task_id}"
+
+
+def progress_key(task_id: str) -> str:
+    """Redis hash holding the latest progress state of a task"""
+    return f"quartr:progress:{task_id}"
+
+
+def decode_progress(raw: dict) -> dict:
+    """Turn an HGETALL reply back into a progress state"""
+    state = {}
+    for field, value in raw.items():
+        field = field.decode() if isinstance(field, bytes) else field
+        value = value.decode() if isinstance(value, bytes) else value
+        state[field] = int(value) if field in _COUNTERS else value
+    return state
+
+
+def read_progress(conn, task_id: str) -> dict:
+    """Latest progress state of a task, empty if it has not reported yet"""
+    return decode_progress(conn.hgetall(progress_key(task_id)))
+
+
+def enqueue_group(huey, subtask, group_id: str, isins, *args) -> None:
+    """Seed a group's progress and enqueue ``subtask(isin, *args, group_id)`` per ISIN
+
+    The progress hash is written before the first subtask is queued, so a
+    subtask that finishes straight away always finds its group. Subtasks
+    go through ``huey.enqueue`` so the storage's own queueing (priorities,
+    immediate mode) applies. If queueing stops part way, the group's total
+    is cut down to what was queued and the error is re-raised.
+    """
+    key = progress_key(group_id)
+    conn = huey.storage.conn
+    pipe = conn.pipeline()
+    pipe.hset(
+        key,
+        mapping={"status": "In Progress", "total": len(isins), "processed": 0, "success": 0, "failed": 0},
+    )
+    pipe.expire(key, PROGRESS_TTL)
+    pipe.execute()
+
+    queued = 0
+    try:
+        for isin in isins:
+            huey.enqueue(subtask.s(isin, *args, group_id))
+            queued += 1
+    except Exception:
+        if not queued:
+            conn.delete(key)
+        else:
+            conn.hset(key, "total", queued)
+            if int(conn.hget(key, "processed") or 0) >= queued:
+                # Everything queued already finished; nothing else will report
+                conn.hset(key, "status", "Complete")
+                conn.publish(progress_channel(group_id), orjson.dumps(read_progress(conn, group_id)))
+        raise
+
+
+def record_subtask_result(conn, group_id: str, isin: str, ok: bool):
+    """Count one finished ISIN of a group and publish the group's progress
+
+    Each ISIN is counted once, however often its subtask runs, and nothing
+    is counted for a group whose progress has expired. Counters are only
+    ever incremented, so concurrent workers cannot overwrite each other.
+    Intermediate events are coalesced across workers to at most one per
+    PUBLISH_INTERVAL_MS; an update held back that way is flushed once the
+    interval ends, and the final one is always published. Returns the new
+    state, or None when nothing was counted.
+    """
+    key = progress_key(group_id)
+    done_key = f"{key}:done"
+    pipe = conn.pipeline()
+    pipe.hget(key, "total")
+    pipe.sadd(done_key, isin)
+    pipe.expire(done_key, PROGRESS_TTL)
+    total, added, _ = pipe.execute()
+    if total is None or not added:
+        return None
+
+    pipe = conn.pipeline()
+    pipe.hincrby(key, "processed", 1)
+    pipe.hincrby(key, "success", 1 if ok else 0)
+    pipe.hincrby(key, "failed", 0 if ok else 1)
+    pipe.expire(key, PROGRESS_TTL)
+    processed, success, failed, _ = pipe.execute()
+
+    state = {
+        "status": "In Progress",
+        "total": int(total),
+        "processed": processed,
+        "success": success,
+        "failed": failed,
+    }
+    if processed >= state["total"]:
+        state["status"] = "Complete"
+        conn.hset(key, "status", "Complete")
+    published_key = f"{key}:published"
+    if state["status"] == "Complete" or conn.set(
+        published_key, 1, nx=True, px=PUBLISH_INTERVAL_MS
+    ):
+        conn.publish(progress_channel(group_id), orjson.dumps(state))
+    elif conn.set(f"{key}:pending", 1, nx=True, px=2 * PUBLISH_INTERVAL_MS):
+        # Held back; one worker makes sure the latest state still goes out
+        # when the interval ends, even if no further subtask finishes by then
+        delay_ms = max(conn.pttl(published_key), 0)
+        timer = threading.Timer(delay_ms / 1000, _flush_progress, (conn, group_id))
+        timer.daemon = True
+        timer.start()
+    return state
+
+
+def _flush_progress(conn, group_id: str) -> None:
+    """Publish the latest state of a group whose last update was held back"""
+    key = progress_key(group_id)
+    if not conn.delete(f"{key}:pending"):
+        return
+    state = read_progress(conn, group_id)
+    if not state or state.get("status") in TERMINAL_STATUSES:
+        # Expired, or the final event has already gone out
+        return
+    # Counts as this interval's event for the throttle
+    conn.set(f"{key}:published", 1, px=PUBLISH_INTERVAL_MS)
+    conn.publish(progress_channel(group_id), orjson.dumps(state))
+
+
+def register_group_signals(huey, subtask) -> None:
+    """Count finished ``subtask`` runs towards their group from the consumer's signals
+
+    ``subtask`` takes the ISIN first and the group id last. Counting from
+    the signals rather than inside the task means a subtask that raises
+    still finishes its group; a failure is only counted once no retries
+    are left.
+    """
+
+    @huey.signal(SIGNAL_COMPLETE, SIGNAL_ERROR)
+    def record_group_member(signal, task, exc=None):
+        if not isinstance(task, subtask.task_class):
+            return
+        if signal == SIGNAL_ERROR and task.retries:
+            return
+        if signal == SIGNAL_COMPLETE:
+            # A run that finished but reports failed uploads counts as failed
+            result = huey.get(task.id)
+            ok = not (isinstance(result, dict) and result.get("failed"))
+        else:
+            ok = False
+        record_subtask_result(huey.storage.conn, task.args[-1], task.args[0], ok)
@@ -1,244 +1,269 @@
-    import streamlit as st
-    # Set page config must be the first Streamlit command
-    st.set_page_config(page_title="Quartr Data Retrieval", page_icon="📊", layout="wide")
-
-    # Import tasks first
-    from tasks import huey, process_files_task, process_single_file
-    from utils import QuartrAPI, TranscriptProcessor, S3Handler
-
-    # Then other imports
-    from streamlit_autorefresh import st_autorefresh
-    import boto3
-    import requests
-    import json
-    from datetime import datetime
-    import pandas as pd
-    import asyncio
-    import aiohttp
-    import aioboto3
-    from typing import List, Dict, Any
-    import io
-    from reportlab.lib import colors
-    from reportlab.lib.pagesizes import letter
-    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    import os
-    from dotenv import load_dotenv
-
-    # Load environment variables
-    load_dotenv()
-
-    # Function to get environment variables
-    def get_env_variable(key: str) -> str:
-        return os.getenv(key)
-
-    # Environment variables configuration
-    QUARTR_API_KEY = get_env_variable("QUARTR_API_KEY")
-    AWS_ACCESS_KEY_ID = get_env_variable("AWS_ACCESS_KEY_ID")
-    AWS_SECRET_ACCESS_KEY = get_env_variable("AWS_SECRET_ACCESS_KEY")
-    AWS_DEFAULT_REGION = get_env_variable("AWS_DEFAULT_REGION")
-    DEFAULT_S3_BUCKET = get_env_variable("DEFAULT_S3_BUCKET")
-    REDIS_URL = get_env_variable("REDIS_URL")
-
-    # Initialize session state
-    if "processing_complete" not in st.session_state:
-        st.session_state.processing_complete = False
-    if "processed_files" not in st.session_state:
-        st.session_state.processed_files = []
-
-    # Auto refresh when task is running
-    if "task_id" in st.session_state:
-        st_autorefresh(interval=10000)  # Refresh every 10 seconds
+import streamlit as st
+# Set page config must be the first Streamlit command
+st.set_page_config(page_title="Quartr Data Retrieval", page_icon="📊", layout="wide")
 
-    def check_task_status():
-        if "task_id" in st.session_state:
-            try:
-                # Create persistent containers if they don't exist
-                if 'progress_container' not in st.session_state:
-                    st.session_state.progress_container = st.empty()
-                if 'status_container' not in st.session_state:
-                    st.session_state.status_container = st.empty()
-                if 'results_container' not in st.session_state:
-                    st.session_state.results_container = st.empty()
-
-                # Get task result
-                result = huey.result(st.session_state.task_id)
-                
-                if result:
-                    if result.get('status') == 'In Progress':
-                        # Update progress bar
-                        total = result.get('total', 0)
-                        processed = result.get('processed', 0)
-                        progress = processed / total if total > 0 else 0
-                        st.session_state.progress_container.progress(progress)
-
-                        # Update status message
-                        st.session_state.status_container.text(
-                            f"Processing files: {processed}/{total}"
-                        )
-
-                        # Update results
-                        success = result.get('success', 0)
-                        failed = result.get('failed', 0)
-                        st.session_state.results_container.text(
-                            f"Successful uploads: {success}\n"
-                            f"Failed uploads: {failed}"
-                        )
-
-                    elif result.get('status') == 'Complete':
-                        # Show completed progress bar
-                        st.session_state.progress_container.progress(1.0)
-                        
-                        # Show completion message
-                        st.session_state.status_container.text("Processing complete!")
-                        
-                        # Show final results
-                        st.session_state.results_container.text(
-                            f"Final results:\n"
-                            f"Total files processed: {result.get('total', 0)}\n"
-                            f"Successful uploads: {result.get('success', 0)}\n"
-                            f"Failed uploads: {result.get('failed', 0)}"
-                        )
-                        
-                        # Clear task ID from session state
-                        del st.session_state["task_id"]
-
-                    elif result.get('status') == 'Failed':
-                        st.error(f"Processing failed: {result.get('error', 'Unknown error')}")
-                        del st.session_state["task_id"]
-
-            except Exception as e:
-                st.error(f"Error checking task status: {str(e)}")
-                if "task_id" in st.session_state:
-                    del st.session_state["task_id"]
-
-    def test_queue_connection():
-        """Test the queue connection with better error handling and feedback"""
+# Import tasks first
+from fanout import consumer_running, process_isin
+from tasks import huey
+
+# Then other imports
+import streamlit.components.v1 as components
+from datetime import date
+from typing import List, Dict, Any
+from uuid import uuid4
+from pathlib import Path
+from config import get_config
+from isins import parse_isins, valid_isins
+from progress import TERMINAL_STATUSES, enqueue_group, read_progress
+
+# Date picker bounds and defaults
+_MIN_DATE = date(2000, 1, 1)
+_MAX_DATE = date(2025, 12, 31)
+_DEFAULT_START = date(2024, 1, 1)
+_DEFAULT_END = date(2024, 12, 31)
+
+# Browser-side listener for task events pushed by the SSE sidecar
+task_stream = components.declare_component(
+    "task_stream", path=str(Path(__file__).parent / "components" / "task_stream")
+)
+
+# Initialize session state
+st.session_state.setdefault("processing_complete", False)
+st.session_state.setdefault("processed_files", [])
+
+@st.cache_data(ttl=2, max_entries=256, show_spinner=False)
+def _fetch_task_state(task_id: str):
+    # Progress lives in a Redis hash the worker writes through Huey's own
+    # connection, so read it through that too; the short TTL lets reruns
+    # within the same couple of seconds share one Redis read
+    return read_progress(huey.storage.conn, task_id)
+
+def show_task_outcome(result: Dict[str, Any]):
+    if result.get('status') == 'Failed':
+        st.error(f"Processing failed: {result.get('error', 'Unknown error')}")
+        return
+
+    with st.status("Processing complete!", state="complete", expanded=True):
+        st.progress(1.0)
+        st.write(
+            f"Total ISINs processed: {result.get('total', 0)} · "
+            f"successful: {result.get('success', 0)} · "
+            f"failed: {result.get('failed', 0)}"
+        )
+
+# Reruns triggered by the task stream only re-execute this fragment,
+# not the form and the rest of the page. The slow poll keeps the view
+# moving if the browser cannot reach the stream.
+@st.fragment(run_every=30)
+def check_task_status():
+    if "task_id" in st.session_state:
         try:
-            from tasks import ping
-            from huey.exceptions import TaskException
-            
-            with st.spinner('Testing queue connection...'):
-                # Enqueue the task
-                task = ping()
-                
-                # Wait for result with timeout
-                try:
-                    response = task.get(blocking=True, timeout=15)  # Increased timeout
-                    if response == "pong":
-                        return True, "Queue connection successful!"
-                    else:
-                        return False, f"Unexpected response from queue: {response}"
-                except TaskException as e:
-                    return False, f"Task execution failed: {str(e)}"
-                except TimeoutError:
-                    return False, "Queue connection timed out. Worker might be unavailable."
+            task_id = st.session_state.task_id
+
+            # Get task progress from the last pushed event or the stored state,
+            # whichever is further along (the stored read may be cached)
+            event = st.session_state.get(f"stream_{task_id}") or {}
+            result = max(
+                event, _fetch_task_state(task_id), key=lambda state: state.get('processed', -1)
+            )
+            if not result:
+                # The group's progress expired without any subtask reporting
+                result = {'status': 'Failed', 'error': 'No progress reported for an hour'}
+            status = result.get('status', 'In Progress')
+
+            if status in TERMINAL_STATUSES:
+                # Hand the outcome to a full run so the form comes back
+                st.session_state.task_outcome = result
+                del st.session_state["task_id"]
+                st.rerun()
+
+            total = result.get('total', 0)
+            processed = result.get('processed', 0)
+
+            # A single status block is patched as one element on each rerun
+            with st.status("Processing files...", expanded=True):
+                st.progress(processed / total if total > 0 else 0)
+                st.write(
+                    f"{processed}/{total} ISINs · "
+                    f"successful: {result.get('success', 0)} · "
+                    f"failed: {result.get('failed', 0)}"
+                )
+
+                # Each event pushed by the sidecar reruns this fragment
+                task_stream(url=f"{get_config().stream_url}/stream/{task_id}", key=f"stream_{task_id}")
+
         except Exception as e:
-            return False, f"Queue connection failed: {str(e)}"
-
-    @st.cache_data(ttl=60)
-    def health_check():
-        return "OK"
-
-    def init_routes():
-        if st.query_params.get("health") == "check":
-            st.write(health_check())
-            st.stop()
-
-    def main():
-        init_routes()
-        st.title("Quartr Data Retrieval and S3 Upload")
-
-        # Validate environment variables
-        if not all([
-            QUARTR_API_KEY,
-            AWS_ACCESS_KEY_ID,
-            AWS_SECRET_ACCESS_KEY,
-            AWS_DEFAULT_REGION,
-            REDIS_URL,
-        ]):
-            st.error("""
-            Missing required environment variables. Please ensure all required environment variables are set.
-            """)
-            return
-
-        # Check task status if task is running
-        check_task_status()
-
-        # Only show form if no task is running
-        if "task_id" not in st.session_state:
-            with st.form(key="quartr_form"):
-                isin_input = st.text_area(
-                    "Enter ISINs (one per line)",
-                    height=100,
+            st.error(f"Error checking task status: {str(e)}")
+            if "task_id" in st.session_state:
+                del st.session_state["task_id"]
+
+def test_queue_connection(round_trip: bool = False):
+    """Test the queue connection with better error handling and feedback
+
+    Checks the broker with a Redis PING and reports the queue depth. Only
+    when ``round_trip`` is set is a ping task sent through a worker.
+    """
+    try:
+        huey.storage.conn.ping()
+        pending = huey.pending_count()
+        scheduled = huey.scheduled_count()
+        if not round_trip:
+            return True, (
+                f"Queue connection successful! "
+                f"Pending tasks: {pending}, scheduled tasks: {scheduled}"
+            )
+
+        from tasks import ping
+        from huey.exceptions import ResultTimeout, TaskException
+
+        with st.spinner('Testing worker round-trip...'):
+            # Enqueue the task
+            task = ping()
+
+            # Wait for result with timeout
+            try:
+                response = task.get(blocking=True, timeout=2)
+                if response == "pong":
+                    return True, "Worker round-trip successful!"
+                else:
+                    return False, f"Unexpected response from queue: {response}"
+            except TaskException as e:
+                return False, f"Task execution failed: {str(e)}"
+            except ResultTimeout:
+                return False, (
+                    f"Worker round-trip timed out with {pending} pending tasks. "
+                    "Worker might be unavailable."
                 )
+    except Exception as e:
+        return False, f"Queue connection failed: {str(e)}"
+
+def main():
+    st.title("Quartr Data Retrieval and S3 Upload")
+
+    # Validate environment variables
+    if not get_config().is_complete:
+        st.error("""
+        Missing required environment variables. Please ensure all required environment variables are set.
+        """)
+        return
+
+    # Only show form if no task is running
+    if "task_id" not in st.session_state:
+        outcome_slot = st.empty()
+        if "task_outcome" in st.session_state:
+            with outcome_slot.container():
+                show_task_outcome(st.session_state.task_outcome)
+
+        form_slot = st.empty()
+        with form_slot.container(), st.form(key="quartr_form"):
+            isin_input = st.text_area(
+                "Enter ISINs (one per line)",
+                height=100,
+            )
+
+            col1, col2 = st.columns(2)
+            with col1:
+                start_date = st.date_input(
+                    "Start Date",
+                    _DEFAULT_START,
+                    help="Select start date for document retrieval",
+                    min_value=_MIN_DATE,
+                )
+            with col2:
+                end_date = st.date_input(
+                    "End Date",
+                    _DEFAULT_END,
+                    help="Select end date for document retrieval",
+                    max_value=_MAX_DATE,
+                )
+
+            doc_types = st.multiselect(
+                "Select document types",
+                ["slides", "report", "transcript", "audio"],
+                default=["slides", "report", "transcript", "audio"],
+            )
 
-                col1, col2 = st.columns(2)
-                with col1:
-                    start_date = st.date_input(
-                        "Start Date",
-                        datetime(2024, 1, 1),
-                        help="Select start date for document retrieval",
-                        min_value=datetime(2000, 1, 1),
+            s3_bucket = st.text_input(
+                "S3 Bucket Name",
+                value=get_config().default_s3_bucket or "",
+            )
+
+            submitted = st.form_submit_button("Start Processing")
+
+            if submitted:
+                if not isin_input or not s3_bucket or not doc_types:
+                    st.error("Please fill in all required fields")
+                    return
+
+                if start_date > end_date:
+                    st.error("Start date must be before end date")
+                    return
+
+                isin_list, malformed = parse_isins(isin_input)
+                if malformed:
+                    st.toast(f"Skipping malformed ISINs: {', '.join(malformed)}")
+                checked_isins = valid_isins(isin_list)
+                if len(checked_isins) < len(isin_list):
+                    invalid = sorted(set(isin_list) - set(checked_isins))
+                    # A toast outlives the form, which is cleared once the task is queued
+                    st.toast(f"Skipping ISINs with an invalid check digit: {', '.join(invalid)}")
+                isin_list = checked_isins
+                if not isin_list:
+                    st.error("Please enter at least one valid ISIN")
+                    return
+
+                if not consumer_running():
+                    # Without it the subtasks would sit in the queue, or be
+                    # dropped by a consumer that does not know them
+                    st.error(
+                        "No worker is running the per-ISIN tasks. "
+                        "Start the worker with `huey_consumer fanout.huey`."
                     )
-                with col2:
-                    end_date = st.date_input(
-                        "End Date",
-                        datetime(2024, 12, 31),
-                        help="Select end date for document retrieval",
-                        max_value=datetime(2025, 12, 31),
+                    return
+
+                try:
+                    # Fan out one Huey task per ISIN so every worker can pick
+                    # up work; they report into a shared progress hash
+                    group_id = uuid4().hex
+                    enqueue_group(
+                        huey,
+                        process_isin,
+                        group_id,
+                        isin_list,
+                        start_date.strftime("%Y-%m-%d"),
+                        end_date.strftime("%Y-%m-%d"),
+                        doc_types,
+                        s3_bucket,
                     )
+                    # Store group ID in session state
+                    st.session_state.task_id = group_id
+                    st.session_state.pop("task_outcome", None)
+                except Exception as e:
+                    st.error(f"An error occurred: {str(e)}")
+                    return
 
-                doc_types = st.multiselect(
-                    "Select document types",
-                    ["slides", "report", "transcript", "audio"],
-                    default=["slides", "report", "transcript", "audio"],
-                )
+        # Swap the form for the progress view in this same run
+        if "task_id" in st.session_state:
+            outcome_slot.empty()
+            form_slot.empty()
+            st.toast("Queued")
 
-                s3_bucket = st.text_input(
-                    "S3 Bucket Name",
-                    value=DEFAULT_S3_BUCKET or "",
-                )
+    # Check task status if task is running; called once per run, after any
+    # submission above, so there is only ever one status fragment
+    check_task_status()
+
+    # Add Queue connection test buttons
+    col1, col2 = st.columns(2)
+    with col1:
+        test_broker = st.button("Test Queue Connection")
+    with col2:
+        test_worker = st.button("Advanced: Test Worker Round-trip")
+    if test_broker or test_worker:
+        success, message = test_queue_connection(round_trip=test_worker)
+        if success:
+            st.success(message)
+        else:
+            st.error(message)
 
-                submitted = st.form_submit_button("Start Processing")
-
-                if submitted:
-                    if not isin_input or not s3_bucket or not doc_types:
-                        st.error("Please fill in all required fields")
-                        return
-
-                    if start_date > end_date:
-                        st.error("Start date must be before end date")
-                        return
-
-                    isin_list = [isin.strip() for isin in isin_input.split("\n") if isin.strip()]
-                    if not isin_list:
-                        st.error("Please enter at least one valid ISIN")
-                        return
-
-                    try:
-                        # Start background task with Huey
-                        task = process_files_task(
-                            isin_list,
-                            start_date.strftime("%Y-%m-%d"),
-                            end_date.strftime("%Y-%m-%d"),
-                            doc_types,
-                            s3_bucket,
-                        )
-                        # Store task ID in session state
-                        st.session_state.task_id = task.id
-                        st.experimental_rerun()
-                    except Exception as e:
-                        st.error(f"An error occurred: {str(e)}")
-                        return
-
-        # Add Queue connection test button
-        if st.button("Test Queue Connection"):
-            success, message = test_queue_connection()
-            if success:
-                st.success(message)
-            else:
-                st.error(message)
-
-    if __name__ == "__main__":
-        main()    
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import orjson
+import redis.asyncio as redis
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+
+from config import get_config
+from progress import TERMINAL_STATUSES, decode_progress, progress_channel, progress_key
+
+KEEPALIVE_SECONDS = 15  # idle time before a comment line keeps proxies from closing the stream
+
+if not get_config().redis_url:
+    # Must be the broker the worker publishes progress to; a local default
+    # would just stream nothing
+    raise RuntimeError("REDIS_URL is not set")
+if not get_config().app_url:
+    raise RuntimeError("APP_URL is not set")
+
+app = FastAPI()
+# Only the Streamlit page opens the stream
+app.add_middleware(
+    CORSMiddleware, allow_origins=[get_config().app_url.rstrip("/")], allow_methods=["GET"]
+)
+
+_redis = redis.Redis.from_url(get_config().redis_url)
+
+
+def _event(data: bytes) -> bytes:
+    return b"data: " + data + b"\n\n"
+
+
+@app.get("/health")
+async def health():
+    # Also confirms the Huey broker is reachable
+    await _redis.ping()
+    return {"status": "ok"}
+
+
+@app.get("/stream/{task_id}")
+async def stream(task_id: str):
+    async def events():
+        pubsub = _redis.pubsub()
+        await pubsub.subscribe(progress_channel(task_id))
+        try:
+            # Replay the stored state so a task that moved on before we
+            # subscribed is not missed
+            state = decode_progress(await _redis.hgetall(progress_key(task_id)))
+            if not state:
+                # Unknown or expired group: nothing will ever be published
+                yield _event(orjson.dumps({"status": "Failed", "error": "Task not found or expired"}))
+                return
+            yield _event(orjson.dumps(state))
+            if state.get("status") in TERMINAL_STATUSES:
+                return
+            while True:
+                message = await pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=KEEPALIVE_SECONDS
+                )
+                if message is None:
+                    yield b": ping\n\n"
+                    continue
+                # Already JSON as published; parse only to spot the final state
+                state = orjson.loads(message["data"])
+                yield _event(message["data"])
+                if state.get("status") in TERMINAL_STATUSES:
+                    break
+        finally:
+            await pubsub.unsubscribe()
+            await pubsub.aclose()
+
+    return StreamingResponse(events(), media_type="text/event-stream")
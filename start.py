@@ -0,0 +1,44 @@
+"""Run the Streamlit app and the SSE sidecar side by side
+
+If either process exits, the other one is stopped and this script exits
+non-zero, so the platform's restart policy brings both back up.
+"""
+import os
+import signal
+import subprocess
+import sys
+import time
+
+
+def main() -> int:
+    port = os.environ.get("PORT", "8501")
+    sidecar_port = os.environ.get("SIDECAR_PORT", "8502")
+    procs = [
+        subprocess.Popen([
+            sys.executable, "-m", "uvicorn", "sidecar:app",
+            "--host", "0.0.0.0", "--port", sidecar_port,
+        ]),
+        subprocess.Popen([
+            sys.executable, "-m", "streamlit", "run", "quartr_streamlit.py",
+            "--server.address", "0.0.0.0", "--server.port", port,
+            "--server.runOnSave", "false", "--server.fileWatcherType", "none",
+        ]),
+    ]
+    # Turn a platform SIGTERM into a normal exit so the children are stopped too
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        while True:
+            for proc in procs:
+                if proc.poll() is not None:
+                    return proc.returncode or 1
+            time.sleep(1)
+    finally:
+        for proc in procs:
+            if proc.poll() is None:
+                proc.terminate()
+        for proc in procs:
+            proc.wait()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,48 @@
+import random
+import string
+
+from isins import parse_isins, valid_isins
+
+VALID = ["US0378331005", "US5949181045", "GB0002634946", "DE000BAY0017", "AU0000XVGZA3", "JP3435000009"]
+
+
+def _luhn_reference(isin):
+    digits = "".join(str(int(char, 36)) for char in isin)
+    total = 0
+    for position, char in enumerate(reversed(digits)):
+        digit = int(char)
+        if position % 2 == 1:
+            digit *= 2
+            if digit > 9:
+                digit -= 9
+        total += digit
+    return total % 10 == 0
+
+
+def test_parse_isins_splits_malformed_entries():
+    isins, malformed = parse_isins(" us0378331005\nUS0378331005\r\nUS037833100\nbad\n\n")
+    assert isins == ["US0378331005"]
+    assert malformed == ["BAD", "US037833100"]
+
+
+def test_valid_isins_known_codes():
+    assert valid_isins(VALID) == VALID
+
+
+def test_valid_isins_rejects_wrong_check_digit():
+    assert valid_isins(["US0378331006", "US0378331005", "GB0002634947"]) == ["US0378331005"]
+
+
+def test_valid_isins_empty():
+    assert valid_isins([]) == []
+
+
+def test_valid_isins_matches_scalar_reference():
+    rng = random.Random(0)
+    codes = [
+        "".join(rng.choice(string.ascii_uppercase) for _ in range(2))
+        + "".join(rng.choice(string.ascii_uppercase + string.digits) for _ in range(9))
+        + rng.choice(string.digits)
+        for _ in range(5000)
+    ]
+    assert valid_isins(codes) == [code for code in codes if _luhn_reference(code)]
@@ -0,0 +1,138 @@
+import time
+
+import fakeredis
+import orjson
+import pytest
+from huey import RedisHuey
+
+from progress import (
+    PUBLISH_INTERVAL_MS,
+    enqueue_group,
+    progress_channel,
+    progress_key,
+    read_progress,
+    record_subtask_result,
+    register_group_signals,
+)
+
+
+@pytest.fixture
+def conn():
+    return fakeredis.FakeRedis()
+
+
+@pytest.fixture
+def huey(conn):
+    return RedisHuey("test", connection_pool=conn.connection_pool)
+
+
+def _published(pubsub):
+    events = []
+    while True:
+        message = pubsub.get_message(ignore_subscribe_messages=True)
+        if message is None:
+            return events
+        events.append(orjson.loads(message["data"]))
+
+
+def _seed(conn, group_id, total):
+    conn.hset(
+        progress_key(group_id),
+        mapping={"status": "In Progress", "total": total, "processed": 0, "success": 0, "failed": 0},
+    )
+
+
+def test_group_completes_once_every_isin_is_counted(conn):
+    _seed(conn, "g", 2)
+    assert record_subtask_result(conn, "g", "A", True)["status"] == "In Progress"
+    state = record_subtask_result(conn, "g", "B", False)
+    assert state == {"status": "Complete", "total": 2, "processed": 2, "success": 1, "failed": 1}
+    assert read_progress(conn, "g") == state
+
+
+def test_repeated_isin_is_counted_once(conn):
+    _seed(conn, "g", 2)
+    record_subtask_result(conn, "g", "A", False)
+    assert record_subtask_result(conn, "g", "A", True) is None
+    assert read_progress(conn, "g")["processed"] == 1
+
+
+def test_expired_group_is_not_completed(conn):
+    assert record_subtask_result(conn, "g", "A", True) is None
+    assert read_progress(conn, "g") == {}
+
+
+def test_intermediate_publishes_are_throttled(conn):
+    _seed(conn, "g", 100)
+    pubsub = conn.pubsub()
+    pubsub.subscribe(progress_channel("g"))
+    pubsub.get_message()
+    start = time.monotonic()
+    for index in range(100):
+        record_subtask_result(conn, "g", str(index), True)
+    elapsed_ms = (time.monotonic() - start) * 1000
+
+    events = _published(pubsub)
+    # At most one intermediate event per interval, plus the final one
+    assert len(events) - 1 <= elapsed_ms // PUBLISH_INTERVAL_MS + 1
+    assert events[-1]["status"] == "Complete"
+    assert events[-1]["processed"] == 100
+
+
+def test_held_back_update_is_flushed_after_the_interval(conn):
+    _seed(conn, "g", 10)
+    pubsub = conn.pubsub()
+    pubsub.subscribe(progress_channel("g"))
+    pubsub.get_message()
+    for index in range(3):
+        record_subtask_result(conn, "g", str(index), True)
+    assert [event["processed"] for event in _published(pubsub)] == [1]
+
+    time.sleep(2 * PUBLISH_INTERVAL_MS / 1000)
+    assert [event["processed"] for event in _published(pubsub)] == [3]
+
+
+def test_enqueue_group_seeds_progress_and_queues_every_isin(huey, conn):
+    @huey.task()
+    def subtask(isin, group_id):
+        return None
+
+    enqueue_group(huey, subtask, "g", ["A", "B", "C"])
+    assert read_progress(conn, "g")["total"] == 3
+    assert sorted(huey.dequeue().args for _ in range(3)) == [("A", "g"), ("B", "g"), ("C", "g")]
+
+
+def test_signals_count_completed_and_raising_subtasks(huey, conn):
+    @huey.task()
+    def subtask(isin, group_id):
+        if isin == "B":
+            raise RuntimeError("upload failed")
+        return {"failed": 0}
+
+    register_group_signals(huey, subtask)
+    enqueue_group(huey, subtask, "g", ["A", "B"])
+    for _ in range(2):
+        huey.execute(huey.dequeue())
+
+    state = read_progress(conn, "g")
+    assert state["status"] == "Complete"
+    assert (state["success"], state["failed"]) == (1, 1)
+
+
+def test_enqueue_group_keeps_what_was_queued_when_queueing_fails(huey, conn, monkeypatch):
+    @huey.task()
+    def subtask(isin, group_id):
+        return None
+
+    enqueue = huey.enqueue
+
+    def flaky_enqueue(task):
+        if task.args[0] == "C":
+            raise ConnectionError("broker went away")
+        return enqueue(task)
+
+    monkeypatch.setattr(huey, "enqueue", flaky_enqueue)
+    with pytest.raises(ConnectionError):
+        enqueue_group(huey, subtask, "g", ["A", "B", "C"])
+    assert read_progress(conn, "g")["total"] == 2
+    assert len(huey) == 2